@@ -5,30 +5,91 @@ Python 3.9+ compatible
 """
 
 import asyncio
-import socket
+import atexit
 import json
 import logging
 import os
 import time
 import random
-import threading
+import queue
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import List, Dict, Union, Optional
+from typing import List, Dict, Union, Optional, NamedTuple, Tuple, Callable
 
 import mouse
 from pynput import keyboard
 
-# Configure logging
+from wowsync_protocol import FramedConnection, LEN_STRUCT, encode_message, decode_message
+
+# Use uvloop's faster event loop when it is installed (not available on Windows)
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+# Draw human-like timing jitter from NumPy in batches when it is installed
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Configure logging, records are queued and written by a background thread
+# so file and console output never block the event loop
+_log_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+_log_handlers = [
+    logging.FileHandler('wowsync.log'),
+    logging.StreamHandler()
+]
+for _handler in _log_handlers:
+    _handler.setFormatter(_log_formatter)
+
+_log_queue = queue.Queue(-1)
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('wowsync.log'),
-        logging.StreamHandler()
-    ]
+    format='%(message)s',  # Final formatting is done by the listener's handlers
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener = QueueListener(_log_queue, *_log_handlers)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Config key names mapped to pynput key objects
+_KEY_MAP = {
+    'space': keyboard.Key.space,
+    'q': 'q',
+    'f1': keyboard.Key.f1,
+    'f2': keyboard.Key.f2,
+    'f3': keyboard.Key.f3,
+    'f4': keyboard.Key.f4,
+    'f5': keyboard.Key.f5,
+}
+
+
+class _UniformPool:
+    """Hands out uniform random numbers pre-drawn in batches"""
+    
+    def __init__(self, size: int = 1024):
+        self._size = size
+        self._rng = np.random.default_rng() if np is not None else None
+        self._values = []
+        self._cursor = 0
+    
+    def uniform(self, a: float, b: float) -> float:
+        """Return a random number between a and b, like random.uniform"""
+        if self._rng is None:
+            return random.uniform(a, b)
+        if self._cursor >= len(self._values):
+            self._values = self._rng.random(self._size).tolist()
+            self._cursor = 0
+        value = self._values[self._cursor]
+        self._cursor += 1
+        return a + (b - a) * value
+
+
+_uniform = _UniformPool().uniform
+
 
 class ConfigManager:
     """Manages configuration files in Documents/wowsync folder"""
@@ -37,6 +98,10 @@ class ConfigManager:
         self.config_dir = Path.home() / "Documents" / "wowsync"
         self.windows_config = self.config_dir / "windows.json"
         self.actions_config = self.config_dir / "actions.json"
+        self._windows_cache = None
+        self._windows_mtime = 0
+        self._actions_cache = None
+        self._actions_mtime = 0
         self._ensure_config_dir()
         self._create_default_configs()
     
@@ -107,19 +172,27 @@ class ConfigManager:
             logger.info(f"Created default actions.json at {self.actions_config}")
     
     def load_windows(self) -> Dict:
-        """Load windows configuration"""
+        """Load windows configuration (cached until the file changes)"""
         try:
-            with open(self.windows_config, 'r') as f:
-                return json.load(f)
+            st = self.windows_config.stat()
+            if self._windows_cache is not None and st.st_mtime == self._windows_mtime:
+                return self._windows_cache
+            self._windows_cache = json.loads(self.windows_config.read_bytes())
+            self._windows_mtime = st.st_mtime
+            return self._windows_cache
         except Exception as e:
             logger.error(f"Failed to load windows config: {e}")
             return {}
     
     def load_actions(self) -> Dict:
-        """Load actions configuration"""
+        """Load actions configuration (cached until the file changes)"""
         try:
-            with open(self.actions_config, 'r') as f:
-                return json.load(f)
+            st = self.actions_config.stat()
+            if self._actions_cache is not None and st.st_mtime == self._actions_mtime:
+                return self._actions_cache
+            self._actions_cache = json.loads(self.actions_config.read_bytes())
+            self._actions_mtime = st.st_mtime
+            return self._actions_cache
         except Exception as e:
             logger.error(f"Failed to load actions config: {e}")
             return {}
@@ -127,8 +200,12 @@ class ConfigManager:
     def save_windows(self, windows_data: Dict):
         """Save windows configuration"""
         try:
-            with open(self.windows_config, 'w') as f:
-                json.dump(windows_data, f, indent=4)
+            # Write to a temp file and swap it in so a crash never leaves a torn config
+            tmp_path = self.windows_config.with_suffix('.json.tmp')
+            tmp_path.write_text(json.dumps(windows_data, indent=4))
+            os.replace(tmp_path, self.windows_config)
+            self._windows_cache = windows_data
+            self._windows_mtime = self.windows_config.stat().st_mtime
             logger.info("Windows configuration saved")
         except Exception as e:
             logger.error(f"Failed to save windows config: {e}")
@@ -164,12 +241,10 @@ class WindowManager:
         
         window_info = self.active_windows[window_key]
         try:
-            # Click on the specified coordinates to focus the window
-            mouse.move(window_info['click_x'], window_info['click_y'])
-            
-            # Add small random offset to make it more human-like (90-110% of position)
-            offset_x = random.uniform(-0.1, 0.1) * 10  # ±10 pixels
-            offset_y = random.uniform(-0.1, 0.1) * 10  # ±10 pixels
+            # Click on the specified coordinates to focus the window,
+            # with a small random offset to make it more human-like (90-110% of position)
+            offset_x = _uniform(-0.1, 0.1) * 10  # ±10 pixels
+            offset_y = _uniform(-0.1, 0.1) * 10  # ±10 pixels
             
             final_x = window_info['click_x'] + offset_x
             final_y = window_info['click_y'] + offset_y
@@ -177,7 +252,8 @@ class WindowManager:
             mouse.move(final_x, final_y)
             mouse.click('left')
             
-            logger.info(f"Focused window {window_key} at ({final_x:.1f}, {final_y:.1f})")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Focused window {window_key} at ({final_x:.1f}, {final_y:.1f})")
             return True
         except Exception as e:
             logger.error(f"Failed to focus window {window_key}: {e}")
@@ -188,6 +264,14 @@ class WindowManager:
         return list(self.active_windows.keys())
 
 
+class CompiledAction(NamedTuple):
+    """Action config resolved once at load time"""
+    keys: Tuple[Tuple[str, Union[keyboard.Key, str]], ...]  # (name, pynput key) pairs
+    delay_after_focus: Tuple[float, float]
+    key_hold_time: Tuple[float, float]
+    delay_between_keys: Tuple[float, float]
+
+
 class ActionHandler:
     """Handles action execution on windows"""
     
@@ -196,63 +280,116 @@ class ActionHandler:
         self.window_manager = window_manager
         self.actions_config = config_manager.load_actions()
         self.keyboard_controller = keyboard.Controller()
+        self._actions = self._compile_actions()
+        self._action_lock = None
     
-    def execute_action(self, window_key: str, action_name: str) -> bool:
-        """Execute an action on a specific window with human-like timing"""
-        if not self.window_manager.focus_window(window_key):
-            return False
+    def _compile_actions(self) -> Dict[str, CompiledAction]:
+        """Resolve key objects and timing ranges for every configured action"""
+        compiled = {}
+        if not isinstance(self.actions_config, dict):
+            logger.error("Actions config must be an object mapping action names to actions")
+            return compiled
         
-        if action_name not in self.actions_config:
-            logger.warning(f"Action {action_name} not found in config")
-            return False
+        for action_name, action in self.actions_config.items():
+            try:
+                compiled[action_name] = self._compile_action(action_name, action)
+            except (TypeError, ValueError) as e:
+                logger.error(f"Invalid action {action_name} in config, skipping it: {e}")
+        return compiled
+    
+    def _compile_action(self, action_name: str, action: Dict) -> CompiledAction:
+        """Resolve a single action, raising ValueError or TypeError if its config is malformed"""
+        if not isinstance(action, dict):
+            raise TypeError(f"expected an object, got {action!r}")
         
-        action = self.actions_config[action_name]
-        try:
-            # Wait random time after focusing (human-like behavior)
-            delay_range = action.get('delay_after_focus', [1, 1.5])
-            focus_delay = random.uniform(delay_range[0], delay_range[1])
-            time.sleep(focus_delay)
-            logger.info(f"Waited {focus_delay:.2f}s after focusing {window_key}")
+        key_names = action.get('keys', [])
+        if not isinstance(key_names, list) or not all(isinstance(key, str) for key in key_names):
+            raise TypeError(f"keys must be a list of key names, got {key_names!r}")
+        
+        keys = []
+        for key in key_names:
+            key_obj = self._get_key_object(key)
+            if key_obj:
+                keys.append((key.lower(), key_obj))
+            else:
+                logger.warning(f"Unknown key {key} in action {action_name}, skipping it")
+        
+        return CompiledAction(
+            keys=tuple(keys),
+            delay_after_focus=self._to_range(action.get('delay_after_focus', [1, 1.5])),
+            key_hold_time=self._to_range(action.get('key_hold_time', [0.09, 0.15])),
+            delay_between_keys=self._to_range(action.get('delay_between_keys', 0.1))
+        )
+    
+    @staticmethod
+    def _to_range(value) -> Tuple[float, float]:
+        """Normalize a fixed delay or a [min, max] list into a (min, max) tuple"""
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (value, value)
+        if (isinstance(value, list) and len(value) == 2
+                and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in value)):
+            return (value[0], value[1])
+        raise ValueError(f"expected a number or a [min, max] pair, got {value!r}")
+    
+    async def aexecute_action(self, window_key: str, action_name: str,
+                              abort_if: Optional[Callable[[], bool]] = None) -> bool:
+        """Execute an action on a specific window with human-like timing, stopping early once abort_if returns True"""
+        # Run one action at a time so idle and server actions don't interleave key presses
+        if self._action_lock is None:
+            self._action_lock = asyncio.Lock()
+        
+        async with self._action_lock:
+            action = self._actions.get(action_name)
+            if action is None:
+                logger.warning(f"Action {action_name} not found in config")
+                return False
             
-            # Execute each key with human-like timing
-            for i, key in enumerate(action['keys']):
-                if i > 0:  # Add delay between keys (except first)
-                    delay_between = action.get('delay_between_keys', 0.1)
-                    time.sleep(delay_between)
-                
-                # Random key hold time (press and release)
-                hold_time_range = action.get('key_hold_time', [0.09, 0.15])
-                hold_time = random.uniform(hold_time_range[0], hold_time_range[1])
+            if abort_if and abort_if():
+                logger.info(f"Skipped {action_name} on {window_key}")
+                return False
+            
+            if not self.window_manager.focus_window(window_key):
+                return False
+            
+            try:
+                # Wait random time after focusing (human-like behavior)
+                focus_delay = _uniform(*action.delay_after_focus)
+                await asyncio.sleep(focus_delay)
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Waited {focus_delay:.2f}s after focusing {window_key}")
                 
-                # Use pynput to press keys
-                key_obj = self._get_key_object(key)
-                if key_obj:
+                # Execute each key with human-like timing
+                for i, (key, key_obj) in enumerate(action.keys):
+                    if i > 0:  # Add delay between keys (except first)
+                        await asyncio.sleep(_uniform(*action.delay_between_keys))
+                    
+                    if abort_if and abort_if():
+                        logger.info(f"Aborted {action_name} on {window_key}")
+                        return False
+                    
+                    # Random key hold time (press and release)
+                    hold_time = _uniform(*action.key_hold_time)
+                    
                     # Key down
                     self.keyboard_controller.press(key_obj)
-                    time.sleep(hold_time)  # Hold the key
-                    # Key up
-                    self.keyboard_controller.release(key_obj)
+                    try:
+                        await asyncio.sleep(hold_time)  # Hold the key
+                    finally:
+                        # Key up, even if the task is cancelled mid-hold
+                        self.keyboard_controller.release(key_obj)
                     
-                    logger.info(f"Pressed {key} for {hold_time:.3f}s on {window_key}")
-            
-            logger.info(f"Executed {action_name} on {window_key}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to execute action {action_name} on {window_key}: {e}")
-            return False
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Pressed {key} for {hold_time:.3f}s on {window_key}")
+                
+                logger.info(f"Executed {action_name} on {window_key}")
+                return True
+            except Exception as e:
+                logger.error(f"Failed to execute action {action_name} on {window_key}: {e}")
+                return False
     
     def _get_key_object(self, key: str):
         """Convert key string to pynput key object"""
-        key_map = {
-            'space': keyboard.Key.space,
-            'q': 'q',
-            'f1': keyboard.Key.f1,
-            'f2': keyboard.Key.f2,
-            'f3': keyboard.Key.f3,
-            'f4': keyboard.Key.f4,
-            'f5': keyboard.Key.f5,
-        }
-        return key_map.get(key.lower(), None)
+        return _KEY_MAP.get(key.lower())
 
 
 class StateManager:
@@ -264,6 +401,8 @@ class StateManager:
         self.action_cooldown = 2  # 2 seconds cooldown between actions
         self.idle_timeout = 10  # 10 seconds to return to idle after action
         self.active_window = None
+        self._idle_event = None
+        self._idle_timer = None
     
     def can_execute_action(self) -> bool:
         """Check if we can execute an action (cooldown check)"""
@@ -275,23 +414,45 @@ class StateManager:
         self.active_window = window_key
         self.last_action_time = time.time()
         logger.info(f"State: {self.current_state}")
+        
+        # Schedule the return to idle instead of having idle mode poll for it
+        self._get_idle_event().clear()
+        if self._idle_timer:
+            self._idle_timer.cancel()
+        self._idle_timer = asyncio.get_running_loop().call_later(self.idle_timeout, self._return_to_idle)
     
     def set_idle(self):
         """Set idle state"""
         self.current_state = "idle"
         self.active_window = None
+        if self._idle_timer:
+            self._idle_timer.cancel()
+            self._idle_timer = None
+        self._get_idle_event().set()
         logger.info("State: idle")
     
+    def _return_to_idle(self):
+        """Return to idle once the active window timeout has passed"""
+        self._idle_timer = None
+        self.set_idle()
+        logger.info("Returned to idle after timeout")
+    
+    def _get_idle_event(self) -> asyncio.Event:
+        """Create the idle event on first use so it binds to the running loop"""
+        if self._idle_event is None:
+            self._idle_event = asyncio.Event()
+            if self.is_idle():
+                self._idle_event.set()
+        return self._idle_event
+    
+    async def wait_until_idle(self):
+        """Wait until the state is idle"""
+        await self._get_idle_event().wait()
+    
     def is_idle(self) -> bool:
         """Check if currently in idle state"""
         return self.current_state == "idle"
     
-    def should_return_to_idle(self) -> bool:
-        """Check if we should return to idle (10 second timeout)"""
-        if self.is_idle():
-            return False
-        return time.time() - self.last_action_time >= self.idle_timeout
-    
     def get_current_state(self) -> str:
         """Get current state"""
         return self.current_state
@@ -318,61 +479,30 @@ class IdleManager:
         logger.info("Starting idle mode")
         
         while self.is_running:
-            # Check if we should return to idle from active state
-            if self.state_manager.should_return_to_idle():
-                self.state_manager.set_idle()
-                logger.info("Returned to idle after timeout")
+            # Only do idle actions if we're actually in idle state, sleeping
+            # until an active window times out back to idle
+            await self.state_manager.wait_until_idle()
             
-            # Only do idle actions if we're actually in idle state
-            if self.state_manager.is_idle():
-                windows = self.window_manager.get_window_list()
-                if windows:
-                    # Get current window
-                    window_key = windows[self.current_window_index % len(windows)]
-                    
-                    # Focus window and perform anti-AFK action
-                    if self.window_manager.focus_window(window_key):
-                        # Random delay between 1-2 seconds after focusing (human-like)
-                        idle_delay = random.uniform(1, 2)
-                        await asyncio.sleep(idle_delay)
-                        
-                        if self.state_manager.is_idle():  # Check if still idle
-                            # Execute idle action (space then Q with random timing)
-                            await self._perform_idle_action(window_key)
-                    
-                    # Move to next window
-                    self.current_window_index = (self.current_window_index + 1) % len(windows)
+            windows = self.window_manager.get_window_list()
+            if windows:
+                # Get current window
+                window_key = windows[self.current_window_index % len(windows)]
+                
+                # Focus window and perform anti-AFK action (space then Q with random timing),
+                # stopping if a server command makes a window active meanwhile
+                await self.action_handler.aexecute_action(
+                    window_key, 'idle_action', abort_if=lambda: not self.state_manager.is_idle()
+                )
+                
+                # Move to next window
+                self.current_window_index = (self.current_window_index + 1) % len(windows)
             
             # Wait before next cycle (human-like timing variation 90-110%)
             base_cycle_time = 8
-            variation = random.uniform(0.9, 1.1)  # 90-110% variation
+            variation = _uniform(0.9, 1.1)  # 90-110% variation
             cycle_delay = base_cycle_time * variation
             await asyncio.sleep(cycle_delay)
     
-    async def _perform_idle_action(self, window_key: str):
-        """Perform idle action with human-like random timing"""
-        try:
-            # Press space first
-            self.action_handler.keyboard_controller.press(keyboard.Key.space)
-            space_hold = random.uniform(0.09, 0.15)
-            await asyncio.sleep(space_hold)
-            self.action_handler.keyboard_controller.release(keyboard.Key.space)
-            
-            # Random delay between space and Q (1-2 seconds)
-            between_delay = random.uniform(1, 2)
-            await asyncio.sleep(between_delay)
-            
-            # Press Q
-            self.action_handler.keyboard_controller.press('q')
-            q_hold = random.uniform(0.09, 0.15)
-            await asyncio.sleep(q_hold)
-            self.action_handler.keyboard_controller.release('q')
-            
-            logger.info(f"Performed idle action on {window_key} (space:{space_hold:.3f}s, delay:{between_delay:.2f}s, q:{q_hold:.3f}s)")
-            
-        except Exception as e:
-            logger.error(f"Error performing idle action: {e}")
-    
     def stop_idle_mode(self):
         """Stop idle mode"""
         self.is_running = False
@@ -388,89 +518,86 @@ class AsyncClient:
         self.idle_manager = idle_manager
         self.state_manager = state_manager
         self.socket = None
-        self.reader = None
-        self.writer = None
+        self.connection = None
         self.server_host = "localhost"
         self.server_port = 8765
         self.connected = False
     
     async def connect_to_server(self):
         """Connect to the server using asyncio socket and listen for commands"""
+        attempts = 0
         while True:
             try:
                 logger.info(f"Connecting to server at {self.server_host}:{self.server_port}")
                 
                 # Create asyncio socket connection
-                self.reader, self.writer = await asyncio.open_connection(
-                    self.server_host, self.server_port
+                loop = asyncio.get_running_loop()
+                _, self.connection = await loop.create_connection(
+                    FramedConnection, self.server_host, self.server_port
                 )
+                # Let the transport buffer bursts before drain() has to wait
+                self.connection.transport.set_write_buffer_limits(high=256 * 1024)
                 
                 self.connected = True
+                attempts = 0
                 logger.info("Connected to server")
                 
                 # Listen for messages
                 while self.connected:
                     try:
-                        # Read message length first (4 bytes)
-                        length_data = await self.reader.readexactly(4)
-                        if not length_data:
+                        message_data = await self.connection.read_message()
+                        if message_data is None:
+                            logger.warning("Server disconnected")
                             break
                         
-                        message_length = int.from_bytes(length_data, byteorder='big')
-                        
-                        # Read the actual message
-                        message_data = await self.reader.readexactly(message_length)
-                        message = message_data.decode('utf-8')
+                        await self.handle_server_message(message_data)
                         
-                        await self.handle_server_message(message)
-                        
-                    except asyncio.IncompleteReadError:
-                        logger.warning("Server disconnected")
-                        break
                     except Exception as e:
                         logger.error(f"Error reading from server: {e}")
                         break
                 
             except Exception as e:
                 logger.error(f"Server connection error: {e}")
-                self.connected = False
-                
-                # Close writer if it exists
-                if self.writer:
-                    self.writer.close()
-                    await self.writer.wait_closed()
-                
-                # Wait before reconnecting
-                logger.info("Reconnecting in 5 seconds...")
-                await asyncio.sleep(5)
+            
+            self.connected = False
+            
+            # Close connection if it exists
+            if self.connection:
+                self.connection.close()
+                await self.connection.wait_closed()
+            
+            # Wait before reconnecting, backing off exponentially up to 30 seconds
+            delay = min(30, 0.5 * 2 ** attempts)
+            attempts += 1
+            logger.info(f"Reconnecting in {delay:g} seconds...")
+            await asyncio.sleep(delay)
     
-    async def send_message(self, message: str):
-        """Send message to server with length prefix"""
-        if not self.connected or not self.writer:
+    async def send_message(self, message_bytes: bytes):
+        """Send an encoded message to server with length prefix"""
+        if not self.connected or not self.connection:
             logger.warning("Not connected to server")
             return False
         
         try:
-            # Encode message
-            message_bytes = message.encode('utf-8')
             message_length = len(message_bytes)
             
             # Send length first (4 bytes) then message
-            length_bytes = message_length.to_bytes(4, byteorder='big')
-            self.writer.write(length_bytes + message_bytes)
-            await self.writer.drain()
+            length_bytes = LEN_STRUCT.pack(message_length)
+            self.connection.writelines((length_bytes, message_bytes))
+            await self.connection.drain()
             
-            logger.debug(f"Sent message: {message}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Sent message: {message_bytes.decode('utf-8')}")
             return True
         except Exception as e:
             logger.error(f"Error sending message: {e}")
             self.connected = False
             return False
     
-    async def handle_server_message(self, message: str):
+    async def handle_server_message(self, message_data: bytes):
         """Handle incoming messages from server"""
         try:
-            data = json.loads(message)
+            data = decode_message(message_data)
             command = data.get('command')
             window = data.get('window')
             action = data.get('action', 'f1_action')  # Default action
@@ -486,14 +613,14 @@ class AsyncClient:
                         'window': window,
                         'action': action
                     }
-                    await self.send_message(json.dumps(response))
+                    await self.send_message(encode_message(response))
                     return
                 
                 # Set active window state
                 self.state_manager.set_active_window(window)
                 
                 # Execute the action
-                success = self.action_handler.execute_action(window, action)
+                success = await self.action_handler.aexecute_action(window, action)
                 
                 # Send response to server
                 response = {
@@ -502,7 +629,7 @@ class AsyncClient:
                     'action': action,
                     'state': self.state_manager.get_current_state()
                 }
-                await self.send_message(json.dumps(response))
+                await self.send_message(encode_message(response))
                 
                 logger.info(f"Action completed on {window}, will return to idle after 10 seconds")
                 
@@ -512,8 +639,8 @@ class AsyncClient:
     def disconnect(self):
         """Disconnect from server"""
         self.connected = False
-        if self.writer:
-            self.writer.close()
+        if self.connection:
+            self.connection.close()
 
 
 class WowSyncClient:
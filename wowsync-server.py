@@ -5,25 +5,70 @@ Uses hostname instead of localhost for network accessibility
 """
 
 import asyncio
+import atexit
 import socket
 import json
 import logging
+import queue
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
+from typing import Optional
 
-logging.basicConfig(level=logging.INFO)
+from wowsync_protocol import FramedConnection, LEN_STRUCT, encode_message
+
+# Use uvloop's faster event loop when it is installed (not available on Windows)
+try:
+    import uvloop
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+except ImportError:
+    pass
+
+# Log through a queue drained by a background thread so console output never blocks the event loop
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+_log_queue = queue.Queue(-1)
+# Final formatting is done by the listener's handler
+logging.basicConfig(level=logging.INFO, format='%(message)s', handlers=[QueueHandler(_log_queue)])
+_log_listener = QueueListener(_log_queue, _log_handler)
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# Frames a client may have waiting to be sent before it is treated as stalled and dropped
+_MAX_PENDING_FRAMES = 256
+
 
 class WowSyncServer:
     """Simple server to send commands to WoW Sync clients"""
     
     def __init__(self, host=None, port=8765):
+        # Look up this machine's name once, it is reused for the default config and logging
+        self._hostname = socket.gethostname()
         # Use hostname if not specified
-        self.host = host if host else socket.gethostname()
+        self.host = host if host else self._hostname
         self.port = port
-        self.clients = []
+        self.clients = {}  # Connection -> queue of frames waiting to be sent
         self.server = None
+        self._stop_event = None
         self.keybinds = self._load_server_config()
+        
+        # Resolve the configured host once so binding needs no lookup, reusing
+        # the machine's address when the host is this machine's name
+        self._ip = self._resolve_host(self._hostname)
+        if isinstance(self.host, str) and self.host:
+            bind_ip = self._ip if self.host == self._hostname else self._resolve_host(self.host)
+            self.host = bind_ip or self.host
+    
+    @staticmethod
+    def _resolve_host(host: str) -> Optional[str]:
+        """Resolve a host name to its IPv4 address, None if it can't be resolved"""
+        try:
+            return socket.gethostbyname(host)
+        except (socket.gaierror, UnicodeError) as e:
+            logger.warning(f"Could not resolve {host}: {e}")
+            return None
     
     def _load_server_config(self):
         """Load server configuration from Documents/wowsync/server.json"""
@@ -34,7 +79,7 @@ class WowSyncServer:
         if not server_config_path.exists():
             config_dir.mkdir(parents=True, exist_ok=True)
             default_config = {
-                "host": socket.gethostname(),
+                "host": self._hostname,
                 "port": 8765,
                 "keybinds": {
                     "F1": "window1",
@@ -65,71 +110,77 @@ class WowSyncServer:
                 "F5": "window5"
             }
     
-    async def handle_client(self, reader, writer):
+    async def handle_client(self, connection: FramedConnection):
         """Handle individual client connections"""
-        client_addr = writer.get_extra_info('peername')
+        client_addr = connection.get_extra_info('peername')
         logger.info(f"Client connected: {client_addr}")
-        self.clients.append((reader, writer))
+        send_queue = asyncio.Queue(maxsize=_MAX_PENDING_FRAMES)
+        self.clients[connection] = send_queue
+        writer_task = asyncio.create_task(self._writer_loop(connection, send_queue))
         
         try:
             while True:
-                # Read message length first (4 bytes)
-                length_data = await reader.readexactly(4)
-                if not length_data:
+                message_data = await connection.read_message()
+                if message_data is None:
+                    logger.info(f"Client {client_addr} disconnected")
                     break
                 
-                message_length = int.from_bytes(length_data, byteorder='big')
-                
-                # Read the actual message
-                message_data = await reader.readexactly(message_length)
-                message = message_data.decode('utf-8')
-                
-                logger.info(f"Received from {client_addr}: {message}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Received from {client_addr}: {message_data.decode('utf-8')}")
                 
-        except asyncio.IncompleteReadError:
-            logger.info(f"Client {client_addr} disconnected")
         except Exception as e:
             logger.error(f"Error handling client {client_addr}: {e}")
         finally:
-            if (reader, writer) in self.clients:
-                self.clients.remove((reader, writer))
-            writer.close()
-            await writer.wait_closed()
+            self.clients.pop(connection, None)
+            writer_task.cancel()
+            connection.close()
+            await connection.wait_closed()
     
-    async def send_to_all_clients(self, message: str):
-        """Send message to all connected clients"""
+    async def _writer_loop(self, connection: FramedConnection, send_queue: asyncio.Queue):
+        """Write queued frames to one client, so a slow client only delays itself"""
+        try:
+            while True:
+                length_bytes, message_bytes = await send_queue.get()
+                connection.writelines((length_bytes, message_bytes))
+                await connection.drain()
+                
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(f"Sent to client: {message_bytes.decode('utf-8')}")
+        except Exception as e:
+            logger.error(f"Error sending to client: {e}")
+            # Closing ends the client's read loop, which removes it from self.clients
+            connection.close()
+    
+    async def send_to_all_clients(self, message_bytes: bytes):
+        """Send an encoded message to all connected clients"""
         if not self.clients:
             logger.warning("No clients connected")
             return
         
-        message_bytes = message.encode('utf-8')
         message_length = len(message_bytes)
-        length_bytes = message_length.to_bytes(4, byteorder='big')
-        
-        disconnected_clients = []
+        length_bytes = LEN_STRUCT.pack(message_length)
         
-        for reader, writer in self.clients:
+        # Hand the frame to every client's writer task without waiting on any of them
+        for connection, send_queue in list(self.clients.items()):
             try:
-                writer.write(length_bytes + message_bytes)
-                await writer.drain()
-                logger.info(f"Sent to client: {message}")
-            except Exception as e:
-                logger.error(f"Error sending to client: {e}")
-                disconnected_clients.append((reader, writer))
-        
-        # Remove disconnected clients
-        for client in disconnected_clients:
-            if client in self.clients:
-                self.clients.remove(client)
+                send_queue.put_nowait((length_bytes, message_bytes))
+            except asyncio.QueueFull:
+                client_addr = connection.get_extra_info('peername')
+                logger.error(f"Client {client_addr} is not keeping up, disconnecting it")
+                self.clients.pop(connection, None)
+                # Abort rather than close, a graceful close would wait on the very buffer that is stuck
+                connection.abort()
     
     async def start_server(self):
         """Start the server"""
-        self.server = await asyncio.start_server(
-            self.handle_client, self.host, self.port
+        loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+        self.server = await loop.create_server(
+            lambda: FramedConnection(self.handle_client), self.host, self.port
         )
         
         logger.info(f"Server started on {self.host}:{self.port}")
-        logger.info(f"Machine IP: {socket.gethostbyname(socket.gethostname())}")
+        logger.info(f"Machine: {self._hostname} ({self._ip or 'unresolved'})")
         logger.info("Keybind mappings:")
         for key, window in self.keybinds.items():
             logger.info(f"  {key} -> {window}")
@@ -141,7 +192,16 @@ class WowSyncServer:
         asyncio.create_task(self.command_handler())
         
         async with self.server:
-            await self.server.serve_forever()
+            await self._stop_event.wait()
+        logger.info("Server stopped")
+    
+    def stop(self):
+        """Stop accepting clients, disconnect the connected ones and let start_server return"""
+        self.server.close()
+        # Server.wait_closed() waits for open connections on newer Pythons, so close them too
+        for connection in list(self.clients):
+            connection.close()
+        self._stop_event.set()
     
     async def send_key_command(self, key: str):
         """Send a key command using the keybind mapping"""
@@ -159,32 +219,50 @@ class WowSyncServer:
             "action": action
         }
         
-        await self.send_to_all_clients(json.dumps(command))
+        await self.send_to_all_clients(encode_message(command))
         logger.info(f"Sent {key_upper} command to {window}")
     
     async def command_handler(self):
         """Handle user input for sending commands"""
+        loop = asyncio.get_running_loop()
+        lines = asyncio.Queue()
+        
+        def forward(line: Optional[str]) -> bool:
+            # The loop is already closed if the server stopped some other way, e.g. Ctrl+C
+            try:
+                loop.call_soon_threadsafe(lines.put_nowait, line)
+                return True
+            except RuntimeError:
+                return False
+        
+        def read_stdin():
+            # Blocking reads happen in a daemon thread so a pending readline never holds up shutdown
+            for line in sys.stdin:
+                if not forward(line) or line.strip().lower() == 'quit':
+                    return
+            forward(None)
+        
+        threading.Thread(target=read_stdin, daemon=True).start()
+        
         while True:
+            line = await lines.get()
+            if line is None:
+                logger.info("Input closed, no more commands will be read")
+                break
+            
+            key = line.strip()
+            if not key:
+                continue
+            
+            if key.lower() == 'quit':
+                logger.info("Stopping server")
+                self.stop()
+                break
+            
             try:
-                # Example: automatically send some test commands
-                await asyncio.sleep(10)  # Wait 10 seconds
-                
-                # Send F1 to mapped window
-                await self.send_key_command("F1")
-                
-                await asyncio.sleep(15)  # Wait 15 seconds
-                
-                # Send F2 to mapped window
-                await self.send_key_command("F2")
-                
-                await asyncio.sleep(15)  # Wait 15 seconds
-                
-                # Send F3 to mapped window
-                await self.send_key_command("F3")
-                
+                await self.send_key_command(key)
             except Exception as e:
                 logger.error(f"Error in command handler: {e}")
-                break
 
 
 async def main():
@@ -0,0 +1,166 @@
+"""
+WoW Sync Protocol - Length-prefixed message framing shared by the client and server
+Every message is a big-endian uint32 length followed by that many bytes of payload.
+Python 3.9+ compatible
+"""
+
+import asyncio
+import json
+import logging
+import struct
+from typing import Optional
+
+# Use orjson to encode and decode messages when it is installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Big-endian uint32 length prefix used to frame every message
+LEN_STRUCT = struct.Struct('>I')
+
+# Largest message accepted from a peer, anything bigger drops the connection
+MAX_MSG_SIZE = 1 << 20
+
+# Size of the receive buffer preallocated for each connection, fits one full-size frame
+_RECV_BUFFER_SIZE = LEN_STRUCT.size + MAX_MSG_SIZE
+
+# Stop reading from the socket once this many received messages are waiting to be handled
+_MAX_QUEUED_MESSAGES = 64
+
+
+def encode_message(obj) -> bytes:
+    """Encode a message object to JSON bytes for sending"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode('utf-8')
+
+
+def decode_message(data: bytes):
+    """Decode received JSON bytes into a message object"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FramedConnection(asyncio.BufferedProtocol):
+    """Length-prefixed message connection that receives straight into a preallocated buffer"""
+    
+    def __init__(self, client_connected_cb=None):
+        self._client_connected_cb = client_connected_cb
+        self.transport = None
+        self._messages = asyncio.Queue()
+        self._reading_paused = False
+        self._buf = bytearray(_RECV_BUFFER_SIZE)
+        self._view = memoryview(self._buf)
+        self._start = 0  # Start of the first unparsed frame
+        self._end = 0  # End of the received data
+        self._can_write = asyncio.Event()
+        self._can_write.set()
+        self._closed = asyncio.Event()
+    
+    def connection_made(self, transport):
+        """Store the transport and start the connection handler if one was given"""
+        self.transport = transport
+        if self._client_connected_cb:
+            asyncio.get_running_loop().create_task(self._client_connected_cb(self))
+    
+    def get_buffer(self, sizehint):
+        """Hand the transport the unfilled part of the receive buffer"""
+        return self._view[self._end:]
+    
+    def buffer_updated(self, nbytes):
+        """Record newly received data and queue the frames it completes"""
+        self._end += nbytes
+        self._parse_frames()
+    
+    def _parse_frames(self, limit: bool = True):
+        """Queue complete frames from the buffer, pausing the peer while the reader is behind"""
+        header_size = LEN_STRUCT.size
+        while self._end - self._start >= header_size:
+            if limit and self._messages.qsize() >= _MAX_QUEUED_MESSAGES:
+                # Leave the rest in the buffer until read_message catches up
+                if not self._reading_paused:
+                    self._reading_paused = True
+                    self.transport.pause_reading()
+                return
+            
+            message_length = LEN_STRUCT.unpack_from(self._buf, self._start)[0]
+            if message_length == 0 or message_length > MAX_MSG_SIZE:
+                logger.error(f"Invalid message length {message_length}, closing connection")
+                self._start = self._end = 0
+                self.transport.close()
+                return
+            
+            frame_end = self._start + header_size + message_length
+            if frame_end > self._end:
+                break
+            
+            self._messages.put_nowait(bytes(self._view[self._start + header_size:frame_end]))
+            self._start = frame_end
+        
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif self._end == len(self._buf):
+            self._compact()
+    
+    def _compact(self):
+        """Move a partial frame to the front of the buffer"""
+        pending = self._end - self._start
+        self._buf[:pending] = bytes(self._view[self._start:self._end])
+        self._start = 0
+        self._end = pending
+    
+    def connection_lost(self, exc):
+        """Wake up any reader or writer waiting on this connection"""
+        # Deliver frames held back by flow control before signalling the close
+        self._parse_frames(limit=False)
+        self._messages.put_nowait(None)
+        self._can_write.set()
+        self._closed.set()
+    
+    def pause_writing(self):
+        """Transport buffer is full, make drain() wait"""
+        self._can_write.clear()
+    
+    def resume_writing(self):
+        """Transport buffer has room again"""
+        self._can_write.set()
+    
+    async def read_message(self) -> Optional[bytes]:
+        """Wait for the next complete message, returns None once the connection is closed"""
+        message = await self._messages.get()
+        if self._reading_paused and self._messages.qsize() <= _MAX_QUEUED_MESSAGES // 2:
+            self._parse_frames()
+            if self._messages.qsize() < _MAX_QUEUED_MESSAGES:
+                self._reading_paused = False
+                self.transport.resume_reading()
+        return message
+    
+    def writelines(self, data):
+        """Write several buffers without joining them first"""
+        self.transport.writelines(data)
+    
+    async def drain(self):
+        """Wait until the transport can accept more data"""
+        await self._can_write.wait()
+        if self.transport.is_closing():
+            raise ConnectionResetError("Connection lost")
+    
+    def get_extra_info(self, name, default=None):
+        """Get transport information such as the peer name"""
+        return self.transport.get_extra_info(name, default)
+    
+    def close(self):
+        """Close the connection"""
+        self.transport.close()
+    
+    def abort(self):
+        """Close the connection at once, dropping any data not yet sent"""
+        self.transport.abort()
+    
+    async def wait_closed(self):
+        """Wait until the connection is fully closed"""
+        await self._closed.wait()